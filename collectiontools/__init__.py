@@ -1,8 +1,15 @@
+from collections import abc
+import functools
+import itertools
+import math
+import operator
+import sys
 from typing import (
     Any,
     Callable,
     Dict,
     Iterable,
+    Iterator,
     List,
     Mapping,
     Optional,
@@ -32,17 +39,146 @@ def append_values(x: Dict[Any, List], y: Mapping) -> Dict[Any, List]:
         {'a': [1, 2], 'b': ['c', 'd']}
     """
     for key, value in y.items():
-        x.setdefault(key, []).append(value)
+        # Avoid allocating an empty list for every call to setdefault. Keys are usually
+        # present after the first call so the exception is rarely raised.
+        try:
+            x[key].append(value)
+        except KeyError:
+            x[key] = [value]
     return x
 
 
-def filter_values(predicate: Callable, x: dict) -> dict:
+def dict_product(**iterables: Iterable) -> Iterator[dict]:
+    """
+    Cartesian product of iterables as dictionaries like :func:`itertools.product`.
+
+    Args:
+        **iterables: Iterables to take the product of, keyed by name.
+
+    Returns:
+        Iterator over dictionaries, one for each combination of values. The rightmost
+        iterable advances fastest.
+
+    Examples:
+
+        >>> from collectiontools import dict_product
+        >>>
+        >>> list(dict_product(a=[1, 2], b="xy"))
+        [{'a': 1, 'b': 'x'}, {'a': 1, 'b': 'y'}, {'a': 2, 'b': 'x'}, {'a': 2, 'b': 'y'}]
+    """
+    # Iterate over batches so advancing to the next element happens in C.
+    return itertools.chain.from_iterable(_dict_product_batch(64, iterables))
+
+
+def dict_product_batch(
+    chunk_size: int = 1024, /, **iterables: Iterable
+) -> Iterator[List[dict]]:
+    """
+    Cartesian product of iterables as batches of dictionaries.
+
+    Args:
+        chunk_size: Maximum number of dictionaries in each batch.
+        **iterables: Iterables to take the product of, keyed by name.
+
+    Returns:
+        Iterator over lists of dictionaries in the same order as :func:`dict_product`.
+        All batches except the last have :code:`chunk_size` elements.
+
+    Examples:
+
+        >>> from collectiontools import dict_product_batch
+        >>>
+        >>> for batch in dict_product_batch(3, a=[1, 2], b="xy"):
+        ...     batch
+        [{'a': 1, 'b': 'x'}, {'a': 1, 'b': 'y'}, {'a': 2, 'b': 'x'}]
+        [{'a': 2, 'b': 'y'}]
+    """
+    # Validate eagerly rather than on the first call to `next`.
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be positive but got {chunk_size}.")
+    return _dict_product_batch(chunk_size, iterables)
+
+
+def _dict_product_batch(chunk_size: int, iterables: dict) -> Iterator[List[dict]]:
+    keys = list(iterables)
+    pools = [list(iterable) for iterable in iterables.values()]
+    if not all(pools):
+        return
+    sizes = [len(pool) for pool in pools]
+
+    # Advance an odometer over the pools and only update the values that changed rather
+    # than building a new dictionary from scratch for each combination. Combinations
+    # are collected in the loop so the generator only suspends once per batch.
+    indices = [0] * len(keys)
+    current = {key: pool[0] for key, pool in zip(keys, pools)}
+    copy = current.copy
+    batch = []
+    append = batch.append
+    while True:
+        append(copy())
+        if len(batch) == chunk_size:
+            yield batch
+            batch = []
+            append = batch.append
+        i = len(keys) - 1
+        while i >= 0:
+            indices[i] += 1
+            if indices[i] < sizes[i]:
+                current[keys[i]] = pools[i][indices[i]]
+                break
+            indices[i] = 0
+            current[keys[i]] = pools[i][0]
+            i -= 1
+        else:
+            if batch:
+                yield batch
+            return
+
+
+def dict_product_columns(**iterables: Iterable) -> Dict[Any, List]:
+    """
+    Cartesian product of iterables as a dictionary of lists.
+
+    Args:
+        **iterables: Iterables to take the product of, keyed by name.
+
+    Returns:
+        Dictionary of lists with the same columns as transposing the output of
+        :func:`dict_product` with :func:`transpose_to_dict`, without creating a
+        dictionary for each combination. If any iterable is empty, every key maps to
+        an empty list.
+
+    Examples:
+
+        >>> from collectiontools import dict_product_columns
+        >>>
+        >>> dict_product_columns(a=[1, 2], b="xy")
+        {'a': [1, 1, 2, 2], 'b': ['x', 'y', 'x', 'y']}
+    """
+    pools = {key: list(iterable) for key, iterable in iterables.items()}
+    sizes = [len(pool) for pool in pools.values()]
+
+    # Each value is repeated once for every combination of the pools to its right, and
+    # the resulting column is tiled once for every combination of the pools to its left.
+    y = {}
+    for i, (key, pool) in enumerate(pools.items()):
+        inner = math.prod(sizes[i + 1 :])
+        outer = math.prod(sizes[:i])
+        column = itertools.chain.from_iterable(
+            itertools.repeat(value, inner) for value in pool
+        )
+        y[key] = list(column) * outer
+    return y
+
+
+def filter_values(predicate: Optional[Callable], x: dict) -> dict:
     """
     Filter a dictionary by values like :func:`filter` for iterables.
 
     Args:
         predicate: Predicate to evaluate on values of :code:`x`. Values are included if
-            :code:`predicate` evaluates to :code:`True`.
+            :code:`predicate` evaluates to :code:`True`. If :code:`None`, values are
+            included if they are truthy.
         x: Dictionary to filter.
 
     Returns:
@@ -54,7 +190,12 @@ def filter_values(predicate: Callable, x: dict) -> dict:
         >>>
         >>> filter_values(lambda x: isinstance(x, int), {"a": 1, "b": 2, "c": "hello"})
         {'a': 1, 'b': 2}
+        >>> filter_values(None, {"a": 0, "b": 2, "c": ""})
+        {'b': 2}
     """
+    # Test truthiness directly rather than calling the predicate for each value.
+    if predicate is None or predicate is bool:
+        return {key: value for key, value in x.items() if value}
     return {key: value for key, value in x.items() if predicate(value)}
 
 
@@ -65,7 +206,8 @@ def map_values(func: Callable, x: dict, recursive: bool = False) -> dict:
     Args:
         func: Function to apply to values of :code:`x`.
         x: Dictionary whose values to map :code:`func` over.
-        recursive: Apply :code:`func` recursively to nested dictionaries.
+        recursive: Apply :code:`func` recursively to nested dictionaries. Raises a
+            :class:`ValueError` if a dictionary contains itself.
 
     Returns:
         Dictionary with values obtained by applying :code:`func` to the values of
@@ -81,14 +223,28 @@ def map_values(func: Callable, x: dict, recursive: bool = False) -> dict:
         >>> map_values(lambda x: 2 * x, {"a": {"b": 3}}, recursive=True)
         {'a': {'b': 6}}
     """
-    return {
+    if recursive:
+        return _map_values_recursive(func, x, set())
+    return {key: func(value) for key, value in x.items()}
+
+
+def _map_values_recursive(func: Callable, x: dict, ancestors: set) -> dict:
+    # Track the dictionaries on the current path to fail on self-referential input
+    # rather than exhausting the recursion limit.
+    marker = id(x)
+    if marker in ancestors:
+        raise ValueError("Cannot map values recursively over a cyclic dictionary.")
+    ancestors.add(marker)
+    y = {
         key: (
-            map_values(func, value, recursive)
-            if recursive and isinstance(value, dict)
+            _map_values_recursive(func, value, ancestors)
+            if isinstance(value, dict)
             else func(value)
         )
         for key, value in x.items()
     }
+    ancestors.remove(marker)
+    return y
 
 
 def transpose(x: Union[Mapping, Iterable]) -> Union[dict, list]:
@@ -117,20 +273,24 @@ def transpose(x: Union[Mapping, Iterable]) -> Union[dict, list]:
         >>> transpose(y) == x
         True
     """
-    if isinstance(x, Mapping):
-        return transpose_to_list(x)
-    elif isinstance(x, Iterable):
-        return transpose_to_dict(x)
-    else:
-        raise ValueError(f"Value must be a mapping or iterable but got {x}.")
+    return _transpose(x)
+
 
+@functools.singledispatch
+def _transpose(x):
+    # Implementations for mappings and iterables are registered below. Dispatching
+    # caches the implementation for each type rather than checking the ABCs every call.
+    raise ValueError(f"Value must be a mapping or iterable but got {x}.")
 
-def transpose_to_dict(x: Iterable[Mapping]) -> Dict[Any, List]:
+
+def transpose_to_dict(x: Iterable[Mapping], trusted: bool = False) -> Dict[Any, List]:
     """
     Transpose an iterable of mappings to a dictionary of lists.
 
     Args:
         x: Iterable to transpose.
+        trusted: Skip validating that all mappings have the same keys. The result is
+            undefined if they do not.
 
     Returns:
         Dictionary of lists.
@@ -142,49 +302,109 @@ def transpose_to_dict(x: Iterable[Mapping]) -> Dict[Any, List]:
         >>> transpose_to_dict([{"a": 1, "b": "hello"}, {"a": 2, "b": "hello"}])
         {'a': [1, 2], 'b': ['hello', 'hello']}
     """
-    y = {}
-    keys = None
-    for i, z in enumerate(x):
-        if keys is None:
-            keys = set(z)
-        elif keys != set(z):
+    it = iter(x)
+    try:
+        first = next(it)
+    except StopIteration:
+        return {}
+
+    keys = tuple(first)
+    if trusted:
+        # Extract the values of each row in a fixed order and pivot them to columns in
+        # C. itemgetter only returns tuples for two or more keys.
+        if len(keys) > 1:
+            getter = operator.itemgetter(*keys)
+        else:
+
+            def getter(z):
+                return tuple(z[key] for key in keys)
+
+        columns = zip(*map(getter, itertools.chain([first], it)))
+        return dict(zip(keys, map(list, columns)))
+
+    # Snapshot the expected keys so validation is unaffected if the first mapping is
+    # mutated while we iterate.
+    expected = frozenset(keys)
+    y = {key: [value] for key, value in first.items()}
+    appenders = {key: values.append for key, values in y.items()}
+    for i, z in enumerate(it, start=1):
+        if z.keys() != expected:
             raise ValueError(
-                f"Iterable has inconsistent keys at position {i}: expected {keys}, got "
-                f"{set(keys)}."
+                f"Iterable has inconsistent keys at position {i}: expected "
+                f"{set(expected)}, got {set(z)}."
             )
         for key, value in z.items():
-            y.setdefault(key, []).append(value)
+            appenders[key](value)
     return y
 
 
 def transpose_to_list(x: Mapping[Any, Iterable]) -> List[Dict]:
     """
     Transpose a mapping of iterables to a list of dictionaries.
+
+    Args:
+        x: Mapping to transpose. Elements of one-dimensional numeric or boolean numpy
+            arrays are converted to Python scalars.
+
+    Returns:
+        List of dictionaries.
+
+    Examples:
+
+        >>> from collectiontools import transpose_to_list
+        >>>
+        >>> transpose_to_list({"a": [1, 2], "b": ["hello", "hello"]})
+        [{'a': 1, 'b': 'hello'}, {'a': 2, 'b': 'hello'}]
     """
-    sizes = {key: len(value) for key, value in x.items()}
-    unique_sizes = set(sizes.values())
-    if len(unique_sizes) > 1:
-        raise ValueError(f"Mapping has inconsistent sizes: {sizes}.")
-    (size,) = unique_sizes
-    y = []
-    for i in range(size):
-        y.append({key: value[i] for key, value in x.items()})
-    return y
+    size = None
+    for value in x.values():
+        if size is None:
+            size = len(value)
+        elif len(value) != size:
+            sizes = {key: len(value) for key, value in x.items()}
+            raise ValueError(f"Mapping has inconsistent sizes: {sizes}.")
+    keys = tuple(x)
+    columns = x.values()
+    # Convert one-dimensional numeric numpy arrays to lists in bulk rather than wrapping
+    # each element as a numpy scalar. Other dtypes, such as datetimes, and masked arrays
+    # would change value under conversion. We only need to check if numpy has been
+    # imported.
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        columns = [
+            (
+                value.tolist()
+                if isinstance(value, numpy.ndarray)
+                and value.ndim == 1
+                and value.dtype.kind in "biufc"
+                and not isinstance(value, numpy.ma.MaskedArray)
+                else value
+            )
+            for value in columns
+        ]
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+_transpose.register(abc.Mapping, transpose_to_list)
+_transpose.register(abc.Iterable, transpose_to_dict)
 
 
 def _update_or_union(
     inplace: bool, x: dict, y: Optional[Mapping] = None, **kwargs
 ) -> dict:
-    if not inplace:
-        x = dict(x)
-    y = y or {}
-    y.update(kwargs)
-
-    for key, value in y.items():
-        if value is Delete:
-            x.pop(key)
-        else:
-            x[key] = value
+    if y is None:
+        y = kwargs
+    elif kwargs:
+        y = {**y, **kwargs}
+
+    # Merge everything in one go and then remove the keys marked for deletion. The keys
+    # are guaranteed to be present because they have just been merged.
+    if inplace:
+        x.update(y)
+    else:
+        x = {**x, **y}
+    for key in [key for key, value in y.items() if value is Delete]:
+        del x[key]
 
     return x
 
@@ -250,5 +470,5 @@ class Delete:
     .. seealso::
 
         :func:`union` and :func:`update` delete keys from a dictionary if the
-        corresponding value is :class:`Delete`.
+        corresponding value is :class:`Delete`. Keys that are not present are ignored.
     """
@@ -1,3 +1,4 @@
+import itertools
 import collectiontools as ct
 import pytest
 
@@ -15,6 +16,8 @@ def test_transpose() -> None:
     assert ct.transpose_to_list(y) == x
     assert ct.transpose(x) == y
     assert ct.transpose(y) == x
+    assert ct.transpose(iter(x)) == y
+    assert ct.transpose(x=x) == y
     assert ct.transpose(ct.transpose(x)) == x
     assert ct.transpose(ct.transpose(y)) == y
 
@@ -26,6 +29,9 @@ def test_transpose() -> None:
             ]
         )
 
+    assert ct.transpose_to_dict(x, trusted=True) == y
+    assert ct.transpose_to_dict([{"a": 1}, {"a": 2}], trusted=True) == {"a": [1, 2]}
+
     with pytest.raises(ValueError, match="inconsistent sizes"):
         ct.transpose_to_list(
             {
@@ -50,6 +56,17 @@ def test_map_values():
         "b": {"c": "hellohello"},
     }
 
+    # Shared nested dictionaries are fine, but cycles are not.
+    shared = {"c": 1}
+    assert ct.map_values(str, {"a": shared, "b": shared}, recursive=True) == {
+        "a": {"c": "1"},
+        "b": {"c": "1"},
+    }
+    cyclic = {"a": 1}
+    cyclic["b"] = {"c": cyclic}
+    with pytest.raises(ValueError, match="cyclic"):
+        ct.map_values(str, cyclic, recursive=True)
+
 
 def test_update_and_union():
     x = {"a": "b", "c": 1}
@@ -58,14 +75,105 @@ def test_update_and_union():
     assert ct.union(x, d=ct.Delete, c=9) == {"c": 9}
     assert "d" in x
 
+    # Deleting missing keys is a no-op.
+    assert ct.union(x, missing=ct.Delete) == x
+    assert ct.update(x, {"missing": ct.Delete}) == {"c": 7, "d": None}
+
 
 def test_filter_values():
     assert ct.filter_values(
         lambda x: isinstance(x, int), {"a": 1, "b": 2, "c": "hello"}
     ) == {"a": 1, "b": 2}
+    assert ct.filter_values(None, {"a": 0, "b": [], "c": "hello"}) == {"c": "hello"}
+    assert ct.filter_values(bool, {"a": 0, "b": [], "c": "hello"}) == {"c": "hello"}
 
 
 def test_append_values():
     x = {}
     assert ct.append_values(x, {"a": 1, "b": "c"}) == {"a": [1], "b": ["c"]}
     assert ct.append_values(x, {"a": 2, "b": "d"}) == {"a": [1, 2], "b": ["c", "d"]}
+
+
+def test_transpose_empty():
+    assert ct.transpose_to_dict([]) == {}
+    assert ct.transpose_to_list({}) == []
+    assert ct.transpose_to_dict(iter([{"a": 1}, {"a": 2}])) == {"a": [1, 2]}
+    assert ct.transpose_to_dict([{}, {}]) == {}
+    with pytest.raises(TypeError):
+        ct.transpose_to_dict([None, {"a": 1}])
+    with pytest.raises(ValueError, match="inconsistent keys at position 1"):
+        ct.transpose_to_dict([{}, {"a": 1}])
+    with pytest.raises(ValueError, match="inconsistent keys at position 2"):
+        ct.transpose_to_dict(iter([{"a": 1}, {"a": 2}, {"b": 3}]))
+    assert ct.transpose_to_dict([{"a": 1, "b": 2}, {"b": 3, "a": 4}]) == {
+        "a": [1, 4],
+        "b": [2, 3],
+    }
+
+
+def test_transpose_to_list_numpy():
+    np = pytest.importorskip("numpy")
+    y = ct.transpose_to_list({"a": np.arange(3), "b": np.linspace(0, 1, 3)})
+    assert y == [{"a": 0, "b": 0.0}, {"a": 1, "b": 0.5}, {"a": 2, "b": 1.0}]
+    assert all(type(row["a"]) is int for row in y)
+
+    # Multi-dimensional arrays are transposed along their first axis.
+    (row,) = ct.transpose_to_list({"a": np.zeros((1, 2)), "b": [None]})
+    assert isinstance(row["a"], np.ndarray)
+
+    # Non-numeric arrays are not converted because their values would change.
+    t = np.array(["2020-01-01"], dtype="datetime64[ns]")
+    (row,) = ct.transpose_to_list({"t": t, "a": np.arange(1)})
+    assert row["t"] == t[0]
+    assert isinstance(row["t"], np.datetime64)
+    assert type(row["a"]) is int
+
+    # Columns are converted independently of their neighbours.
+    y = ct.transpose_to_list({"a": np.arange(2), "b": [1, 2]})
+    assert all(type(row["a"]) is int for row in y)
+
+    # Masked arrays are not converted so masked entries remain masked.
+    masked = np.ma.masked_array([1, 2], mask=[True, False])
+    y = ct.transpose_to_list({"a": masked, "b": np.arange(2)})
+    assert y[0]["a"] is np.ma.masked
+    assert y[1]["a"] == 2
+
+
+def test_dict_product():
+    iterables = {"a": [1, 2, 3], "b": "xy", "c": range(2)}
+    expected = [
+        dict(zip(iterables, item)) for item in itertools.product(*iterables.values())
+    ]
+    assert list(ct.dict_product(**iterables)) == expected
+    assert list(ct.dict_product()) == [{}]
+    assert list(ct.dict_product(a=[1, 2], b=[])) == []
+
+
+def test_update_does_not_modify_values():
+    y = {"a": 1}
+    assert ct.union({}, y, b=2) == {"a": 1, "b": 2}
+    assert ct.update({}, y, b=2) == {"a": 1, "b": 2}
+    assert y == {"a": 1}
+
+
+def test_dict_product_batch():
+    iterables = {"a": [1, 2, 3], "b": "xy", "chunk_size": range(2)}
+    expected = list(ct.dict_product(**iterables))
+    batches = list(ct.dict_product_batch(5, **iterables))
+    assert [len(batch) for batch in batches] == [5, 5, 2]
+    assert list(itertools.chain.from_iterable(batches)) == expected
+    assert list(ct.dict_product_batch(**iterables)) == [expected]
+    assert list(ct.dict_product_batch(a=[])) == []
+
+    assert list(ct.dict_product_batch(6, **iterables)) == [expected[:6], expected[6:]]
+
+    with pytest.raises(ValueError, match="must be positive"):
+        ct.dict_product_batch(0, a=[1])
+
+
+def test_dict_product_columns():
+    iterables = {"a": [1, 2, 3], "b": "xy", "c": range(2)}
+    y = ct.dict_product_columns(**iterables)
+    assert y == ct.transpose_to_dict(ct.dict_product(**iterables))
+    assert ct.dict_product_columns() == {}
+    assert ct.dict_product_columns(a=[1, 2], b=[]) == {"a": [], "b": []}